@@ -10,56 +10,108 @@ import shutil
 import argparse
 import subprocess
 import platform
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 
 def run_command(cmd, cwd=None):
-    """Run a command and return the result."""
+    """Run a command and return whether it succeeded.
+
+    Output is streamed straight to the console rather than buffered, since
+    PyInstaller logs can be large and live progress is more useful.
+    """
     print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    sys.stdout.flush()
+    result = subprocess.run(cmd, cwd=cwd, check=False)
     if result.returncode != 0:
-        print(f"Error running command: {result.stderr}")
+        print(f"Error running command (exit code {result.returncode})")
         return False
-    print(result.stdout)
     return True
 
 
-def check_dependencies():
-    """Check if required dependencies are installed."""
-    print("Checking dependencies...")
-
-    # Check PyInstaller
+def _check_module(module_name, label, install_name):
+    """Import a module and return (label, ok, version_or_error)."""
     try:
-        import PyInstaller
-
-        print(f"✓ PyInstaller version: {PyInstaller.__version__}")
+        module = __import__(module_name)
     except ImportError:
-        print("✗ PyInstaller not found. Install with: pip install pyinstaller")
-        return False
+        return label, False, f"Install with: pip install {install_name}"
+    return label, True, getattr(module, "__version__", None)
 
-    # Check watchdog
-    try:
-        import watchdog
 
-        print(f"✓ Watchdog version: {watchdog.__version__}")
-    except ImportError:
-        print("✗ Watchdog not found. Install with: pip install watchdog")
-        return False
+# (module name, display label, pip package name), in report order
+DEPENDENCIES = [
+    ("PyInstaller", "PyInstaller", "pyinstaller"),
+    ("watchdog", "Watchdog", "watchdog"),
+    ("cocoindex", "CocoIndex", "cocoindex"),
+]
 
-    # Check cocoindex
-    try:
-        import cocoindex
 
-        print(f"✓ CocoIndex found")
-    except ImportError:
-        print("✗ CocoIndex not found. Install with: pip install cocoindex")
-        return False
+def check_dependencies():
+    """Check if required dependencies are installed."""
+    print("Checking dependencies...")
 
-    return True
+    # Import probes are independent, so run them concurrently; the slowest
+    # import (cocoindex) then bounds the wall time instead of the sum.
+    with ThreadPoolExecutor() as executor:
+        futures = {executor.submit(_check_module, *dep): dep[0] for dep in DEPENDENCIES}
+        results = {futures[f]: f.result() for f in as_completed(futures)}
+
+    all_ok = True
+    for module_name, _, _ in DEPENDENCIES:
+        label, ok, detail = results[module_name]
+        if not ok:
+            print(f"✗ {label} not found. {detail}")
+            all_ok = False
+        elif detail:
+            print(f"✓ {label} version: {detail}")
+        else:
+            print(f"✓ {label} found")
+
+    return all_ok
+
+
+APP_NAME = "cocoindex-watcher"
+
+# Modules pulled in by the dependency tree but never used by the watcher at
+# runtime: GUI/plotting backends, interactive shells, test runners and the
+# bundled test suites of the scientific stack. `sympy.testing` and
+# `torch.testing` are deliberately absent since their packages import them.
+EXCLUDES = {
+    "tkinter",
+    "matplotlib",
+    "IPython",
+    "jupyter",
+    "jupyter_client",
+    "jupyter_core",
+    "notebook",
+    "pytest",
+    "numpy.tests",
+    "scipy.tests",
+    "pandas.tests",
+    "sklearn.tests",
+}
+
+
+def get_executable_path(output_dir="dist", mode="onedir"):
+    """Return where PyInstaller puts the executable, relative to the project root."""
+    executable_name = APP_NAME
+    if platform.system().lower() == "windows":
+        executable_name += ".exe"
 
+    output_path = Path(output_dir)
+    if mode == "onedir":
+        # onedir builds a folder holding the executable and its libraries
+        return output_path / APP_NAME / executable_name
+    return output_path / executable_name
 
-def build_executable(output_dir="dist", clean=False):
-    """Build the standalone executable."""
+
+def build_executable(output_dir="dist", clean=False, mode="onedir", upx_dir=None):
+    """Build the standalone executable.
+
+    `onedir` (the default) starts fastest since nothing has to be unpacked on
+    launch; `onefile` produces a single file that self-extracts to a temp dir
+    on every run.
+    """
     project_root = Path(__file__).parent
 
     # Clean previous builds
@@ -78,74 +130,63 @@ def build_executable(output_dir="dist", clean=False):
     cmd = [
         "pyinstaller",
         "--clean",
-        "--onefile",
+        f"--{mode}",
         "--console",
+        "--noconfirm",
         "--name",
-        "cocoindex-watcher",
+        APP_NAME,
         "--distpath",
         str(output_path),
-        "standalone_watcher.py",
     ]
 
+    if upx_dir:
+        cmd.extend(["--upx-dir", upx_dir])
+
     # Platform-specific optimizations
     system = platform.system().lower()
 
     if system == "windows":
         # Windows-specific options
-        cmd.extend(
-            [
-                "--add-data",
-                "python/cocoindex;cocoindex",
-                "--exclude-module",
-                "tkinter",
-                "--exclude-module",
-                "matplotlib",
-            ]
-        )
+        cmd.extend(["--add-data", "python/cocoindex;cocoindex"])
     else:
-        # Unix-like systems (Linux, macOS)
-        cmd.extend(
-            [
-                "--add-data",
-                "python/cocoindex:cocoindex",
-                "--exclude-module",
-                "tkinter",
-                "--exclude-module",
-                "matplotlib",
-            ]
-        )
-
-    print(f"Building executable for {system}...")
+        # Unix-like systems (Linux, macOS); strip debug symbols from binaries
+        cmd.extend(["--add-data", "python/cocoindex:cocoindex", "--strip"])
+
+    # Sorted so the command line (and PyInstaller's build cache) is stable
+    for module in sorted(EXCLUDES):
+        cmd.extend(["--exclude-module", module])
+
+    cmd.append("standalone_watcher.py")
+
+    print(f"Building {mode} executable for {system}...")
 
     if not run_command(cmd, cwd=project_root):
         print("Build failed!")
         return False
 
     # Find the generated executable
-    executable_name = "cocoindex-watcher"
-    if system == "windows":
-        executable_name += ".exe"
-
-    executable_path = output_path / executable_name
+    executable_path = project_root / get_executable_path(output_dir, mode)
 
     if executable_path.exists():
         print(f"✓ Executable built successfully: {executable_path}")
-        print(f"  Size: {executable_path.stat().st_size / 1024 / 1024:.1f} MB")
+        if mode == "onedir":
+            size = sum(
+                f.stat().st_size
+                for f in executable_path.parent.rglob("*")
+                if f.is_file()
+            )
+        else:
+            size = executable_path.stat().st_size
+        print(f"  Size: {size / 1024 / 1024:.1f} MB")
         return True
     else:
         print("✗ Executable not found after build")
         return False
 
 
-def test_executable(output_dir="dist"):
+def test_executable(output_dir="dist", mode="onedir"):
     """Test the built executable."""
-    project_root = Path(__file__).parent
-    executable_name = "cocoindex-watcher"
-
-    if platform.system().lower() == "windows":
-        executable_name += ".exe"
-
-    executable_path = project_root / output_dir / executable_name
+    executable_path = Path(__file__).parent / get_executable_path(output_dir, mode)
 
     if not executable_path.exists():
         print("Executable not found for testing")
@@ -176,6 +217,15 @@ def main():
     parser.add_argument(
         "--skip-deps-check", action="store_true", help="Skip dependency checks"
     )
+    parser.add_argument(
+        "--mode",
+        choices=["onedir", "onefile"],
+        default="onedir",
+        help="Build a folder (faster startup) or a single self-extracting file (default: onedir)",
+    )
+    parser.add_argument(
+        "--upx-dir", help="Directory containing UPX, used to compress the binaries"
+    )
 
     args = parser.parse_args()
 
@@ -193,20 +243,21 @@ def main():
         print()
 
     # Build executable
-    if not build_executable(args.output_dir, args.clean):
+    if not build_executable(args.output_dir, args.clean, args.mode, args.upx_dir):
         print("Build failed!")
         sys.exit(1)
 
     # Test executable
     if args.test:
-        if not test_executable(args.output_dir):
+        if not test_executable(args.output_dir, args.mode):
             print("Test failed!")
             sys.exit(1)
 
     print("\nBuild completed successfully!")
-    print(f"Executable location: {Path(args.output_dir) / 'cocoindex-watcher'}")
+    executable_path = get_executable_path(args.output_dir, args.mode)
+    print(f"Executable location: {executable_path}")
     print("\nUsage example:")
-    print(f"  ./{Path(args.output_dir) / 'cocoindex-watcher'} /path/to/watch ./main.py")
+    print(f"  ./{executable_path} /path/to/watch ./main.py")
 
 
 if __name__ == "__main__":
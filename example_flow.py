@@ -7,6 +7,8 @@ This is a simple flow that processes text files and creates embeddings.
 import cocoindex
 import os
 from pathlib import Path
+from numpy.typing import NDArray
+import numpy as np
 
 # Set up some basic environment variables if not already set
 if not os.environ.get("COCOINDEX_DATABASE_URL"):
@@ -15,6 +17,21 @@ if not os.environ.get("COCOINDEX_DATABASE_URL"):
     )
 
 
+@cocoindex.transform_flow()
+def text_to_embedding(
+    text: cocoindex.DataSlice[str],
+) -> cocoindex.DataSlice[NDArray[np.float32]]:
+    """
+    Embed text with a SentenceTransformer model.
+    Shared by indexing and querying so both use the same embedding space.
+    """
+    return text.transform(
+        cocoindex.functions.SentenceTransformerEmbed(
+            model="sentence-transformers/all-MiniLM-L6-v2"
+        )
+    )
+
+
 @cocoindex.flow_def(name="ExampleTextEmbedding")
 def example_text_embedding_flow(
     flow_builder: cocoindex.FlowBuilder, data_scope: cocoindex.DataScope
@@ -55,12 +72,7 @@ def example_text_embedding_flow(
         # Transform data of each chunk
         with doc["chunks"].row() as chunk:
             # Create embeddings for each chunk
-            # Using a simple sentence transformer model
-            chunk["embedding"] = chunk["text"].transform(
-                cocoindex.functions.SentenceTransformerEmbed(
-                    model="sentence-transformers/all-MiniLM-L6-v2"
-                )
-            )
+            chunk["embedding"] = text_to_embedding(chunk["text"])
 
             # Collect the chunk data
             doc_embeddings.collect(
@@ -114,58 +126,99 @@ def create_test_data():
 
     for filename, content in sample_files.items():
         file_path = test_dir / filename
-        if not file_path.exists():
-            file_path.write_text(content.strip())
-            print(f"Created test file: {file_path}")
+        # O_EXCL folds the existence check into the open, so an existing file
+        # is left untouched without a separate stat (and without a race).
+        try:
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content.strip())
+        print(f"Created test file: {file_path}")
+
+
+# Connection pool for queries, created on first use
+_POOL = None
+_SEARCH_STATEMENT = "example_search"
+
+
+def _get_pool():
+    """Get the shared query connection pool, creating it if needed."""
+    global _POOL
+    if _POOL is None:
+        from psycopg2.pool import ThreadedConnectionPool
+        from pgvector.psycopg2 import register_vector
+
+        _POOL = ThreadedConnectionPool(1, 4, os.environ["COCOINDEX_DATABASE_URL"])
+        conn = _POOL.getconn()
+        try:
+            # The numpy -> vector adapter is registered globally, so this covers
+            # every connection the pool hands out later.
+            register_vector(conn)
+        finally:
+            _POOL.putconn(conn)
+    return _POOL
+
+
+def search(query: str, top_k: int = 5):
+    """
+    Find the `top_k` chunks nearest to `query`.
+    Returns (filename, text, chunk_size, distance) rows, nearest first.
+    """
+    import psycopg2.errors
+
+    table_name = cocoindex.utils.get_target_default_name(
+        example_text_embedding_flow, "example_embeddings"
+    )
+    # Embed the query with the same model used for indexing
+    query_vector = text_to_embedding.eval(query)
+
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        # Read-only lookups need no transaction, and a failed EXECUTE below
+        # must not leave the connection in an aborted one.
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            params = (query_vector, top_k)
+            try:
+                cur.execute(f"EXECUTE {_SEARCH_STATEMENT} (%s, %s)", params)
+            except psycopg2.errors.InvalidSqlStatementName:
+                # Prepared statements are per connection; plan this one once.
+                # Ordering by the distance operator lets the HNSW index serve it.
+                cur.execute(
+                    f"""
+                    PREPARE {_SEARCH_STATEMENT} (vector, int) AS
+                    SELECT filename, text, chunk_size, embedding <=> $1 AS distance
+                    FROM {table_name}
+                    ORDER BY embedding <=> $1
+                    LIMIT $2
+                """
+                )
+                cur.execute(f"EXECUTE {_SEARCH_STATEMENT} (%s, %s)", params)
+            return cur.fetchall()
+    finally:
+        pool.putconn(conn)
 
 
 def query_example():
     """Example of how to query the indexed data."""
-    import psycopg2
-    from pgvector.psycopg2 import register_vector
-
     try:
-        # Connect to the database
-        conn = psycopg2.connect(
-            host="localhost",
-            database="cocoindex",
-            user="cocoindex",
-            password="cocoindex",
-        )
-        register_vector(conn)
-
-        cur = conn.cursor()
+        cocoindex.init()
 
         # Query for documents similar to a search term
         search_query = "machine learning algorithms"
-
-        # This is a simplified query - in practice you'd want to embed the search query
-        # and use vector similarity search
-        cur.execute(
-            """
-            SELECT filename, text, chunk_size
-            FROM example_embeddings
-            WHERE text ILIKE %s
-            ORDER BY filename, location
-            LIMIT 5
-        """,
-            (f"%{search_query}%",),
-        )
-
-        results = cur.fetchall()
+        results = search(search_query)
 
         print(f"\nSearch results for '{search_query}':")
         print("-" * 50)
 
-        for filename, text, chunk_size in results:
-            print(f"File: {filename}")
+        for filename, text, chunk_size, distance in results:
+            print(f"[{1.0 - distance:.3f}] File: {filename}")
             print(f"Text: {text[:100]}...")
             print(f"Chunk size: {chunk_size}")
             print("-" * 30)
 
-        cur.close()
-        conn.close()
-
     except Exception as e:
         print(f"Query failed: {e}")
         print("Make sure PostgreSQL is running and the data has been indexed.")
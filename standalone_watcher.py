@@ -8,95 +8,301 @@ A self-contained executable that can:
 """
 
 import os
+import re
+import logging
+import stat
 import sys
 import time
 import signal
+import shutil
+import socket
+import selectors
 import argparse
 import subprocess
 import threading
+import queue
+import collections
+import fnmatch
+import importlib.util
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence
 
 try:
     from watchdog.observers import Observer
+    from watchdog.observers.polling import PollingObserver
     from watchdog.events import FileSystemEventHandler
 except ImportError:
     print("Error: watchdog package is required but not installed.")
     print("Install with: pip install watchdog")
     sys.exit(1)
 
+log = logging.getLogger("cocoindex_watcher")
+
 # Global variables for graceful shutdown
 observer = None
 mcp_server_process = None
 shutdown_event = threading.Event()
-mcp_server_thread = None
+
+# Editor swap/backup files, VCS metadata and bytecode caches never affect the index
+DEFAULT_EXCLUDE_GLOBS = ["*.swp", "*~", ".git/*", "__pycache__/*"]
+
+
+# Event types that can change what gets indexed
+CONTENT_EVENT_TYPES = {"created", "modified", "moved", "deleted"}
+
+# Filesystems where native change notifications are missing or unreliable.
+# Kept in sync with watch_and_index.py by hand: the scripts ship separately.
+NETWORK_FS_TYPES = {
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "9p",
+    "fuse.sshfs",
+    "fuse.grpcfuse",
+}
+
+
+# Upper bound on a single `cocoindex update` run
+INDEX_TIMEOUT_SECONDS = 300
+
+# Lines of indexer stderr kept for the failure report
+ERROR_TAIL_LINES = 50
+
+
+def _compile_globs(patterns: Sequence[str]) -> Optional[re.Pattern]:
+    """Compile glob patterns into a single regex, or None if there are none."""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
 
 
 class CocoIndexEventHandler(FileSystemEventHandler):
     """File system event handler that triggers CocoIndex indexing."""
 
-    def __init__(self, watch_path: str, app_target: str, debounce_seconds: float = 2.0):
+    def __init__(
+        self,
+        watch_path: str,
+        app_target: str,
+        debounce_seconds: float = 2.0,
+        include_globs: Optional[Sequence[str]] = None,
+        exclude_globs: Optional[Sequence[str]] = None,
+    ):
         self.watch_path = Path(watch_path)
         self.app_target = app_target
         self.debounce_seconds = debounce_seconds
-        self.last_trigger_time = 0
+        # Compile once here so filtering an event is a regex match, not a compile
+        self._include_re = _compile_globs(include_globs or [])
+        self._exclude_re = _compile_globs(
+            DEFAULT_EXCLUDE_GLOBS if exclude_globs is None else exclude_globs
+        )
         self.lock = threading.Lock()
+        self._pending: set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+        # At most one run waits behind the one in progress; a later request
+        # collapses into it since `cocoindex update` picks up every change.
+        self._queue: queue.Queue = queue.Queue(maxsize=1)
+        # The `cocoindex update` child currently running, if any, and whether
+        # shutdown has begun; both are guarded by self.lock
+        self._proc: Optional[subprocess.Popen] = None
+        self._stopping = False
+        # Resolve the PATH lookup once; an absolute path also lets CPython use
+        # posix_spawn where it can still honor close_fds
+        self._cocoindex_bin = shutil.which("cocoindex") or "cocoindex"
+        # Probe once up front rather than spawning `cocoindex --version` per event
+        self._cocoindex_ok = self.check_cocoindex_available()
+        # Indexing runs here, off the watchdog and timer threads, one at a time
+        self._worker = threading.Thread(
+            target=self._indexing_worker, name="cocoindex-indexer", daemon=True
+        )
+        self._worker.start()
 
     def on_any_event(self, event):
         """Handle any file system event."""
-        if event.is_directory:
+        # Only content changes matter. opened/closed_no_write are also
+        # delivered, including for the indexer's own reads of the watched
+        # files, and re-arming the timer on those would re-index forever.
+        if event.is_directory or event.event_type not in CONTENT_EVENT_TYPES:
+            return
+
+        # A move reports the meaningful path as dest_path (e.g. editors that
+        # save by renaming a temp file over the original).
+        paths = [
+            p
+            for p in (event.src_path, getattr(event, "dest_path", None))
+            if p and self.is_relevant(p)
+        ]
+        if not paths:
             return
 
-        # Debounce rapid file changes
-        current_time = time.time()
+        # Coalesce bursts: every event re-arms the timer, so indexing runs once
+        # after `debounce_seconds` of quiet and covers all changes in the burst.
         with self.lock:
-            if current_time - self.last_trigger_time < self.debounce_seconds:
-                return
-            self.last_trigger_time = current_time
+            self._pending.update(paths)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce_seconds, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def is_relevant(self, path: str) -> bool:
+        """Check a path against the include/exclude globs.
+
+        Patterns are matched against the path relative to the watch root and
+        against each of its trailing sub-paths, so `.git/*` also excludes
+        `sub/.git/HEAD` and `*.swp` matches at any depth.
+        """
+        try:
+            rel = Path(path).relative_to(self.watch_path).as_posix()
+        except ValueError:
+            rel = Path(path).as_posix()
+        parts = rel.split("/")
+        candidates = ["/".join(parts[i:]) for i in range(len(parts))]
 
-        print(
-            f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Change detected: {event.src_path}"
-        )
+        if self._exclude_re and any(self._exclude_re.match(c) for c in candidates):
+            return False
+        if self._include_re and not any(self._include_re.match(c) for c in candidates):
+            return False
+        return True
+
+    def _flush(self):
+        """Index once for all changes accumulated since the last flush."""
+        with self.lock:
+            changed = self._pending
+            self._pending = set()
+            self._timer = None
+
+        if not changed:
+            return
+
+        if len(changed) == 1:
+            log.info("Change detected: %s", next(iter(changed)))
+        else:
+            log.info("Changes detected in %d files", len(changed))
         self.trigger_indexing()
 
+    def cancel_pending(self):
+        """Cancel any scheduled indexing run and stop the one in progress.
+
+        The worker is a daemon thread, so a `cocoindex update` child left
+        running here would be orphaned with broken pipes at interpreter exit.
+        """
+        with self.lock:
+            self._stopping = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending.clear()
+            proc = self._proc
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        if proc is not None and proc.poll() is None:
+            log.info("Stopping indexing in progress...")
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                log.warning("Force killing indexing process...")
+                proc.kill()
+                proc.wait()
+
     def trigger_indexing(self):
-        """Trigger CocoIndex indexing operation."""
+        """Schedule an indexing run on the worker thread without waiting for it."""
         try:
-            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Starting indexing...")
+            self._queue.put_nowait(True)
+        except queue.Full:
+            # A run is already queued and will cover these changes too
+            pass
+
+    def _indexing_worker(self):
+        """Run queued indexing requests one after another."""
+        while True:
+            self._queue.get()
+            self.run_indexing()
+
+    def run_indexing(self):
+        """Run a CocoIndex indexing operation and wait for it to finish."""
+        try:
+            log.info("Starting indexing...")
 
-            # Check if cocoindex is available
-            if not self.check_cocoindex_available():
-                print(
+            if not self._cocoindex_ok:
+                log.error(
                     "Error: CocoIndex is not available. Please ensure it's installed and in PATH."
                 )
                 return
 
-            # Run the indexing command
-            cmd = ["cocoindex", "update", self.app_target]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            # Run the indexing command. Stdout is relayed line by line as it
+            # arrives; of stderr only the tail is kept, for the failure report,
+            # so memory stays bounded however much the indexer writes.
+            cmd = [self._cocoindex_bin, "update", self.app_target]
+            with self.lock:
+                # Don't start a run once cancel_pending() has begun shutdown
+                if self._stopping:
+                    return
+                proc = self._proc = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    bufsize=1,
+                )
+            err_tail: collections.deque[str] = collections.deque(
+                maxlen=ERROR_TAIL_LINES
+            )
+            err_reader = threading.Thread(
+                target=err_tail.extend, args=(proc.stderr,), daemon=True
+            )
+            err_reader.start()
+
+            timed_out = threading.Event()
 
-            if result.returncode == 0:
-                print(
-                    f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ✅ Indexing completed successfully"
+            def kill_on_timeout():
+                timed_out.set()
+                proc.kill()
+
+            # Enforce the deadline from a timer so the blocking reads below
+            # end (at EOF) once the process is killed
+            killer = threading.Timer(INDEX_TIMEOUT_SECONDS, kill_on_timeout)
+            killer.daemon = True
+            killer.start()
+            try:
+                for line in proc.stdout:
+                    log.info("Output: %s", line.rstrip())
+                returncode = proc.wait()
+            finally:
+                killer.cancel()
+                with self.lock:
+                    self._proc = None
+            err_reader.join()
+
+            if timed_out.is_set():
+                log.error(
+                    "⏱️  Indexing timed out after %d seconds", INDEX_TIMEOUT_SECONDS
                 )
-                if result.stdout.strip():
-                    print(f"Output: {result.stdout.strip()}")
+            elif self._stopping:
+                log.info("Indexing stopped for shutdown")
+            elif returncode == 0:
+                log.info("✅ Indexing completed successfully")
             else:
-                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ❌ Indexing failed")
-                print(f"Error: {result.stderr.strip()}")
+                log.error("❌ Indexing failed (exit code %d)", returncode)
+                if err_tail:
+                    log.error("Error: %s", "".join(err_tail).strip())
 
-        except subprocess.TimeoutExpired:
-            print(
-                f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ⏱️  Indexing timed out after 5 minutes"
-            )
         except Exception as e:
-            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Error during indexing: {e}")
+            log.error("Error during indexing: %s", e)
 
     def check_cocoindex_available(self) -> bool:
         """Check if cocoindex command is available."""
         try:
             result = subprocess.run(
-                ["cocoindex", "--version"], capture_output=True, text=True, timeout=10
+                [self._cocoindex_bin, "--version"],
+                capture_output=True,
+                text=True,
+                timeout=10,
             )
             return result.returncode == 0
         except (subprocess.TimeoutExpired, FileNotFoundError):
@@ -108,9 +314,7 @@ def setup_signal_handlers() -> None:
 
     def signal_handler(signum, frame):
         """Handle shutdown signals."""
-        print(
-            f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Received signal {signum}, shutting down..."
-        )
+        log.info("Received signal %s, shutting down...", signum)
         shutdown_event.set()
 
         # Stop the file watcher
@@ -119,17 +323,7 @@ def setup_signal_handlers() -> None:
             observer.stop()
 
         # Stop the MCP server
-        global mcp_server_process
-        if mcp_server_process and mcp_server_process.poll() is None:
-            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Terminating MCP server...")
-            mcp_server_process.terminate()
-            try:
-                mcp_server_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                print(
-                    f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Force killing MCP server..."
-                )
-                mcp_server_process.kill()
+        _stop_mcp_server()
 
         sys.exit(0)
 
@@ -138,18 +332,73 @@ def setup_signal_handlers() -> None:
         signal.signal(signal.SIGTERM, signal_handler)
 
 
+def _mount_fs_type(path: Path) -> Optional[str]:
+    """Return the filesystem type of the mount containing `path` (Linux only).
+
+    watch_and_index.mount_fs_type does the same lookup, duplicated on purpose.
+    """
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+
+    best_point, best_type = "", None
+    path_str = str(path)
+    for mount_point, fs_type in mounts:
+        # /proc/mounts escapes spaces in mount points as \040
+        mount_point = mount_point.replace("\\040", " ")
+        if (
+            path_str == mount_point
+            or path_str.startswith(mount_point.rstrip("/") + "/")
+        ) and len(mount_point) > len(best_point):
+            best_point, best_type = mount_point, fs_type
+    return best_type
+
+
+def create_observer(mode: str, watch_path: Path) -> tuple[object, str]:
+    """Create the watchdog observer for `mode` and describe the backend chosen.
+
+    `auto` uses native notifications except on network/virtual filesystems,
+    where they are unreliable and polling is the only way to see changes.
+    """
+    if mode == "auto":
+        fs_type = _mount_fs_type(watch_path)
+        if fs_type in NETWORK_FS_TYPES:
+            return PollingObserver(), f"polling (auto, {fs_type} filesystem)"
+        mode = "native"
+
+    if mode == "polling":
+        return PollingObserver(), "polling"
+
+    if sys.platform.startswith("linux"):
+        try:
+            # Use inotify directly rather than going through the platform lookup
+            from watchdog.observers.inotify import InotifyObserver
+
+            return InotifyObserver(), "native (inotify)"
+        except ImportError:
+            pass
+    return Observer(), "native"
+
+
 def validate_paths(watch_path: str, app_target: str) -> tuple[Path, Path]:
     """Validate and resolve paths."""
-    watch_path_obj = Path(watch_path).resolve()
-    app_target_obj = Path(app_target).resolve()
+    watch_path_obj = Path(os.path.realpath(watch_path))
+    app_target_obj = Path(os.path.realpath(app_target))
 
-    if not watch_path_obj.exists():
+    # A single stat per path answers both "exists?" and "is a directory?"
+    try:
+        watch_stat = os.stat(watch_path_obj)
+    except FileNotFoundError:
         raise FileNotFoundError(f"Watch path does not exist: {watch_path_obj}")
 
-    if not watch_path_obj.is_dir():
+    if not stat.S_ISDIR(watch_stat.st_mode):
         raise NotADirectoryError(f"Watch path is not a directory: {watch_path_obj}")
 
-    if not app_target_obj.exists():
+    try:
+        os.stat(app_target_obj)
+    except FileNotFoundError:
         raise FileNotFoundError(f"App target does not exist: {app_target_obj}")
 
     return watch_path_obj, app_target_obj
@@ -224,6 +473,27 @@ Examples:
         help="Don't watch subdirectories recursively",
     )
 
+    parser.add_argument(
+        "--include-glob",
+        action="append",
+        metavar="PATTERN",
+        help="Only trigger indexing for files matching this glob (repeatable; default: all files)",
+    )
+
+    parser.add_argument(
+        "--exclude-glob",
+        action="append",
+        metavar="PATTERN",
+        help=f"Ignore changes to files matching this glob (repeatable; default: {' '.join(DEFAULT_EXCLUDE_GLOBS)})",
+    )
+
+    parser.add_argument(
+        "--observer",
+        choices=["auto", "native", "polling"],
+        default="auto",
+        help="File change detection backend; auto falls back to polling on network filesystems (default: auto)",
+    )
+
     parser.add_argument(
         "--initial-index",
         action="store_true",
@@ -237,28 +507,68 @@ Examples:
     return parser.parse_args()
 
 
-def run_mcp_server(address: str, flow_file: str) -> None:
-    """Run CocoIndex as an MCP server."""
-    print(f"Starting CocoIndex MCP server on {address}")
-    print(f"Using flow file: {flow_file}")
+def _cocoindex_importable() -> bool:
+    """Check that the cocoindex package can be imported by this interpreter.
+
+    The server runs under the same interpreter, so locating the package here
+    is enough; it avoids spawning a second Python just to import it, and
+    avoids loading the engine into the long-lived watcher process.
+    """
+    return importlib.util.find_spec("cocoindex") is not None
+
+
+def _wait_for_port(
+    host: str,
+    port: int,
+    timeout: float = 10.0,
+    process: Optional[subprocess.Popen] = None,
+) -> bool:
+    """Wait until a TCP connection to host:port succeeds.
+
+    Retries with exponential backoff (50ms up to 500ms) until `timeout`
+    seconds have passed. Gives up early if `process` exits, since then the
+    server has failed to start and nothing will ever listen.
+    """
+    # A wildcard bind address is reachable through loopback
+    if host in ("", "0.0.0.0"):
+        host = "127.0.0.1"
+    elif host == "::":
+        host = "::1"
+
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=0.1):
+                return True
+        except OSError:
+            pass
+        if process is not None and process.poll() is not None:
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+
 
-    # Validate that the flow file exists
+def _validate_mcp_prereqs(flow_file: str) -> bool:
+    """Check that the flow file and the cocoindex package are available."""
     if not os.path.exists(flow_file):
-        print(f"Error: Flow file '{flow_file}' not found!")
-        print("Make sure your flow file is accessible from the current directory.")
-        sys.exit(1)
+        log.error("Error: Flow file '%s' not found!", flow_file)
+        log.error("Make sure your flow file is accessible from the current directory.")
+        return False
 
-    try:
-        # Import cocoindex to ensure it's available
-        subprocess.run(
-            [sys.executable, "-c", "import cocoindex"], check=True, capture_output=True
-        )
-    except subprocess.CalledProcessError:
-        print("Error: CocoIndex is not installed or not accessible!")
-        sys.exit(1)
+    if not _cocoindex_importable():
+        log.error("Error: CocoIndex is not installed or not accessible!")
+        return False
+
+    return True
 
-    # Run the CocoIndex MCP server
-    cmd = [
+
+def _build_mcp_cmd(address: str, flow_file: str) -> list[str]:
+    """Build the command line that runs the CocoIndex MCP server."""
+    return [
         sys.executable,
         "-m",
         "cocoindex.cli",
@@ -268,102 +578,165 @@ def run_mcp_server(address: str, flow_file: str) -> None:
         address,
     ]
 
-    print(f"Executing: {' '.join(cmd)}")
 
+def run_mcp_server(address: str, flow_file: str) -> None:
+    """Run CocoIndex as an MCP server, in place of the current process."""
+    log.info("Starting CocoIndex MCP server on %s", address)
+    log.info("Using flow file: %s", flow_file)
+
+    if not _validate_mcp_prereqs(flow_file):
+        sys.exit(1)
+
+    cmd = _build_mcp_cmd(address, flow_file)
+    log.info("Executing: %s", " ".join(cmd))
+
+    if os.name == "posix":
+        # Nothing else runs in this mode, so replace the current process with
+        # the server instead of keeping an idle parent interpreter around.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execvp(sys.executable, cmd)
+
+    # Windows has no real exec; os.exec* spawns a detached child and exits
     try:
         subprocess.run(cmd, check=True)
     except subprocess.CalledProcessError as e:
-        print(f"Error running MCP server: {e}")
+        log.error("Error running MCP server: %s", e)
         sys.exit(1)
     except KeyboardInterrupt:
-        print("\nMCP server stopped by user.")
+        log.info("MCP server stopped by user.")
         sys.exit(0)
 
 
-def run_mcp_server_threaded(address: str, flow_file: str) -> None:
-    """Run CocoIndex MCP server in a separate thread."""
+def start_mcp_server_process(
+    address: str, flow_file: str
+) -> Optional[subprocess.Popen]:
+    """Start the CocoIndex MCP server as a child process of the watcher.
+
+    On POSIX the server's output is piped back for the main loop to relay.
+    Windows can't select() on pipes, so there the server writes to the
+    console directly.
+    """
     global mcp_server_process
 
-    print(
-        f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Starting CocoIndex MCP server on {address}"
-    )
-    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Using flow file: {flow_file}")
+    log.info("Starting CocoIndex MCP server on %s", address)
+    log.info("Using flow file: %s", flow_file)
 
-    # Validate that the flow file exists
-    if not os.path.exists(flow_file):
-        print(
-            f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Error: Flow file '{flow_file}' not found!"
-        )
-        print("Make sure your flow file is accessible from the current directory.")
-        return
+    if not _validate_mcp_prereqs(flow_file):
+        return None
+
+    cmd = _build_mcp_cmd(address, flow_file)
+    log.info("Starting MCP server with command: %s", " ".join(cmd))
 
+    piped = os.name == "posix"
     try:
-        # Import cocoindex to ensure it's available
-        subprocess.run(
-            [sys.executable, "-c", "import cocoindex"], check=True, capture_output=True
-        )
-    except subprocess.CalledProcessError:
-        print(
-            f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Error: CocoIndex is not installed or not accessible!"
+        mcp_server_process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE if piped else None,
+            stderr=subprocess.STDOUT if piped else None,
         )
-        return
+    except OSError as e:
+        log.error("Error running MCP server: %s", e)
+        return None
+    return mcp_server_process
 
-    # Run the CocoIndex MCP server as a subprocess
-    cmd = [
-        sys.executable,
-        "-m",
-        "cocoindex.cli",
-        "server",
-        flow_file,
-        "--address",
-        address,
-    ]
 
-    print(
-        f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Starting MCP server with command: {' '.join(cmd)}"
-    )
+def _stop_mcp_server() -> None:
+    """Terminate the MCP server child if it is still running."""
+    if mcp_server_process and mcp_server_process.poll() is None:
+        log.info("Terminating MCP server process...")
+        mcp_server_process.terminate()
+        try:
+            mcp_server_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            log.warning("Force killing MCP server process...")
+            mcp_server_process.kill()
 
-    try:
-        mcp_server_process = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
 
-        # Wait for the process to complete or be terminated
-        while not shutdown_event.is_set():
-            if mcp_server_process.poll() is not None:
-                # Process has terminated
-                stdout, stderr = mcp_server_process.communicate()
-                if stdout:
-                    print(
-                        f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] MCP Server stdout: {stdout}"
-                    )
-                if stderr:
-                    print(
-                        f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] MCP Server stderr: {stderr}"
-                    )
-                break
-            time.sleep(0.1)
+def _relay_mcp_output(data: bytes) -> None:
+    """Log each line of MCP server output."""
+    for line in data.decode(errors="replace").splitlines():
+        log.info("MCP Server: %s", line)
 
-    except Exception as e:
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Error running MCP server: {e}")
+
+def run_main_loop(process: Optional[subprocess.Popen]) -> None:
+    """Block the main thread until shutdown, supervising the MCP server.
+
+    One selector watches the server's output pipe and a socket that Python
+    writes to whenever a signal arrives (signal.set_wakeup_fd), so the loop
+    sleeps until there is output to relay, the server exits, or a signal
+    needs handling. No extra thread is needed to supervise the server.
+    """
+    selector = selectors.DefaultSelector()
+    wakeup_r, wakeup_w = socket.socketpair()
+    wakeup_r.setblocking(False)
+    wakeup_w.setblocking(False)
+    old_wakeup_fd = signal.set_wakeup_fd(wakeup_w.fileno())
+    selector.register(wakeup_r, selectors.EVENT_READ)
+
+    if process is not None and process.stdout is not None:
+        selector.register(process.stdout, selectors.EVENT_READ)
+    # Without a pipe to watch (Windows), check on the server once a second
+    poll_timeout = 1.0 if process is not None and process.stdout is None else None
+    partial = b""
+
+    try:
+        while not shutdown_event.is_set():
+            for key, _ in selector.select(poll_timeout):
+                if key.fileobj is wakeup_r:
+                    # The signal handler itself performs the shutdown
+                    wakeup_r.recv(4096)
+                    continue
+
+                data = os.read(key.fd, 65536)
+                if data:
+                    complete, _, partial = (partial + data).rpartition(b"\n")
+                    if complete:
+                        _relay_mcp_output(complete)
+                    continue
+
+                # EOF: the server closed its output, i.e. it has exited
+                selector.unregister(key.fileobj)
+                if partial:
+                    _relay_mcp_output(partial)
+                    partial = b""
+                _report_mcp_exit(process.wait())
+
+            if poll_timeout is not None and process.poll() is not None:
+                _report_mcp_exit(process.returncode)
+                poll_timeout = None
     finally:
-        if mcp_server_process and mcp_server_process.poll() is None:
-            print(
-                f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Terminating MCP server process..."
-            )
-            mcp_server_process.terminate()
-            try:
-                mcp_server_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                print(
-                    f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Force killing MCP server process..."
-                )
-                mcp_server_process.kill()
+        signal.set_wakeup_fd(old_wakeup_fd)
+        selector.close()
+        wakeup_r.close()
+        wakeup_w.close()
+
+
+def _report_mcp_ready(
+    host: str, port: int, address: str, process: subprocess.Popen
+) -> None:
+    """Log whether the MCP server has started accepting connections."""
+    if _wait_for_port(host, port, process=process):
+        log.info("MCP server is accepting connections")
+    else:
+        log.warning("Warning: MCP server is not reachable on %s yet", address)
+
+
+def _report_mcp_exit(returncode: int) -> None:
+    """Report an MCP server exit that wasn't requested by the watcher."""
+    if not shutdown_event.is_set():
+        log.warning("MCP server exited with code %s", returncode)
 
 
 def main() -> None:
     """Main entry point for the standalone watcher."""
-    global mcp_server_thread
+    # Log to stdout so records interleave with the startup summary printed below
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format="[%(asctime)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 
     args = parse_arguments()
 
@@ -389,32 +762,52 @@ def main() -> None:
     # Setup signal handlers
     setup_signal_handlers()
 
-    # Start MCP server in a separate thread if requested
+    # Check the MCP address up front so a bad one exits before anything starts
     if args.with_mcp_server:
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Starting MCP server thread...")
-        mcp_server_thread = threading.Thread(
-            target=run_mcp_server_threaded,
-            args=(args.address, args.flow_file),
-            daemon=True,
-        )
-        mcp_server_thread.start()
-        time.sleep(2)  # Give the MCP server a moment to start
+        host, _, port = args.address.rpartition(":")
+        try:
+            port_num = int(port)
+        except ValueError:
+            print(f"Error: invalid MCP server address '{args.address}'")
+            sys.exit(1)
 
     # Create event handler for file watching
     event_handler = CocoIndexEventHandler(
-        str(watch_path), str(app_target), args.debounce_seconds
+        str(watch_path),
+        str(app_target),
+        args.debounce_seconds,
+        include_globs=args.include_glob,
+        exclude_globs=args.exclude_glob,
     )
 
     # Check if CocoIndex is available
-    if not event_handler.check_cocoindex_available():
+    if not event_handler._cocoindex_ok:
         print(
             "Error: CocoIndex is not available. Please ensure it's installed and in PATH."
         )
         sys.exit(1)
 
+    global observer
+    observer, observer_desc = create_observer(args.observer, watch_path)
+
+    # Start the MCP server as a child process if requested. It is started
+    # only now, right before the main loop that drains its output pipe, and
+    # nothing below blocks: readiness is probed in the background and the
+    # initial index runs on the worker thread.
+    process = None
+    if args.with_mcp_server:
+        process = start_mcp_server_process(args.address, args.flow_file)
+    if process is not None:
+        threading.Thread(
+            target=_report_mcp_ready,
+            args=(host.strip("[]"), port_num, args.address, process),
+            name="mcp-ready-probe",
+            daemon=True,
+        ).start()
+
     # Run initial indexing if requested
     if args.initial_index:
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Running initial indexing...")
+        log.info("Running initial indexing...")
         event_handler.trigger_indexing()
 
     # Start watching
@@ -422,11 +815,15 @@ def main() -> None:
     if args.with_mcp_server:
         mode_desc += " + MCP Server"
 
-    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Starting CocoIndex {mode_desc}")
+    log.info("Starting CocoIndex %s", mode_desc)
     print(f"  Watch Path: {watch_path}")
     print(f"  App Target: {app_target}")
     print(f"  Recursive: {not args.no_recursive}")
+    print(f"  Observer: {observer_desc}")
     print(f"  Debounce: {args.debounce_seconds}s")
+    if args.include_glob:
+        print(f"  Include: {', '.join(args.include_glob)}")
+    print(f"  Exclude: {', '.join(args.exclude_glob or DEFAULT_EXCLUDE_GLOBS)}")
 
     if args.with_mcp_server:
         print(f"  MCP Server: {args.address}")
@@ -434,21 +831,18 @@ def main() -> None:
 
     print(f"  Press Ctrl+C to stop")
 
-    global observer
-    observer = Observer()
-    observer.schedule(event_handler, str(watch_path), recursive=not args.no_recursive)
-
     try:
+        observer.schedule(
+            event_handler, str(watch_path), recursive=not args.no_recursive
+        )
         observer.start()
 
-        # Keep the main thread alive
-        while not shutdown_event.is_set():
-            time.sleep(1)
+        run_main_loop(process)
 
     except KeyboardInterrupt:
-        print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Keyboard interrupt received")
+        log.info("Keyboard interrupt received")
     except Exception as e:
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Unexpected error: {e}")
+        log.error("Unexpected error: %s", e)
     finally:
         # Cleanup
         shutdown_event.set()
@@ -457,13 +851,11 @@ def main() -> None:
             observer.stop()
             observer.join()
 
-        if mcp_server_thread and mcp_server_thread.is_alive():
-            print(
-                f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Waiting for MCP server thread to finish..."
-            )
-            mcp_server_thread.join(timeout=5)
+        event_handler.cancel_pending()
+
+        _stop_mcp_server()
 
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Services stopped")
+        log.info("Services stopped")
 
 
 if __name__ == "__main__":
@@ -1,112 +1,549 @@
+import logging
 import time
 import subprocess
 import threading
 import os
+import queue
+import selectors
 import signal
+import socket
 import sys
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.observers.polling import PollingObserver
+from watchdog.events import PatternMatchingEventHandler
+from watchdog.utils.patterns import match_any_paths
+
+log = logging.getLogger("watch_and_index")
 
 WATCH_PATH = "/data_to_index"
 APP_TARGET = os.environ.get("APP_TARGET", "python/cocoindex/cli.py")
 MCP_ADDRESS = os.environ.get("ADDRESS", "0.0.0.0:8000")
+# Resolved once, and the same interpreter (and venv) this script runs under
+PY = sys.executable
+INDEX_ARGV = [PY, "-m", "cocoindex.cli", "update", APP_TARGET]
+SERVER_ARGV = [
+    PY,
+    "-m",
+    "cocoindex.cli",
+    "server",
+    APP_TARGET,
+    "--address",
+    MCP_ADDRESS,
+]
+# Quiet period after the last change before a burst of changes is indexed
+DEBOUNCE_SEC = float(os.environ.get("DEBOUNCE_SEC", "1.0"))
+# "inotify" (native notifications), "polling", or "auto" to poll only on
+# network filesystems where native notifications don't arrive
+WATCH_MODE = os.environ.get("WATCH_MODE", "inotify")
+# Seconds between directory scans when polling; each scan stats every file
+WATCH_INTERVAL = float(os.environ.get("WATCH_INTERVAL", "30"))
+# Nice increment for indexing, so it can't starve the event-draining threads
+INDEX_NICE = int(os.environ.get("INDEX_NICE", "10"))
+# How long the watcher waits for the MCP server to accept connections
+SERVER_READY_TIMEOUT = 30.0
+# Filesystems where native change notifications are missing or unreliable.
+# Kept in sync with standalone_watcher.py by hand: the scripts ship separately.
+NETWORK_FS_TYPES = {
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "9p",
+    "fuse.sshfs",
+    "fuse.grpcfuse",
+}
+
+# Set by the signal handler; the main thread blocks on it instead of polling
+shutdown_event = threading.Event()
+
+# (epoch, paths) batches of changes waiting for the indexing worker
+work_q = queue.Queue(maxsize=8)
+
+# Editor swap/temp files and hidden files, matched against the file name
+IGNORE_PATTERNS = ["*.swp", "*.tmp", "~*", ".*"]
+# Directories (by name, at any depth) that are neither watched nor indexed
+IGNORE_DIR_NAMES = set(
+    filter(
+        None,
+        os.environ.get(
+            "WATCH_IGNORE_DIRS", ".git,node_modules,__pycache__,.venv"
+        ).split(","),
+    )
+)
+
+
+def load_flows_in_process():
+    """Load the flows of APP_TARGET into this process so indexing is a function
+    call rather than a new interpreter per burst. Returns False if that fails."""
+    try:
+        import cocoindex.cli
+        from dotenv import find_dotenv, load_dotenv
+
+        # Same setup as the `cocoindex` CLI group, so settings that only live
+        # in .env (e.g. COCOINDEX_DATABASE_URL) apply here as in the fallback
+        load_dotenv(dotenv_path=find_dotenv(usecwd=True))
+        cocoindex.cli._initialize_cocoindex_in_process()
+        cocoindex.cli._load_user_app(APP_TARGET)
+    except Exception as e:
+        log.warning("In-process indexing unavailable (%s); using the CLI instead.", e)
+        return False
+    return True
+
+
+def lower_thread_priority(increment):
+    """Lower the CPU priority of the calling thread by `increment` nice levels.
+
+    Linux keeps a nice value per thread; threads and processes started from
+    this one inherit it.
+    """
+    if increment <= 0 or not sys.platform.startswith("linux"):
+        return
+    tid = threading.get_native_id()
+    try:
+        niceness = os.getpriority(os.PRIO_PROCESS, tid) + increment
+        os.setpriority(os.PRIO_PROCESS, tid, min(niceness, 19))
+    except OSError as e:
+        log.warning("Cannot lower indexing priority: %s", e)
+
+
+def in_ignored_dir(path):
+    """Whether `path` lies inside one of IGNORE_DIR_NAMES below WATCH_PATH"""
+    rel_dirs = os.path.relpath(path, WATCH_PATH).split(os.sep)[:-1]
+    return any(part in IGNORE_DIR_NAMES for part in rel_dirs)
+
+
+def plan_watches(path):
+    """Split the tree at `path` into (directory, recursive) watches that cover
+    every directory except the ignored ones, and count the directories covered.
+
+    Subtrees without ignored directories collapse into one recursive watch;
+    directories that contain an ignored one are watched on their own.
+    """
+    try:
+        with os.scandir(path) as entries:
+            subdirs = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+    except OSError:
+        return [(path, True)], 1
+    plan, count, pruned = [], 1, False
+    for subdir in subdirs:
+        if os.path.basename(subdir) in IGNORE_DIR_NAMES:
+            pruned = True
+            continue
+        sub_plan, sub_count = plan_watches(subdir)
+        plan += sub_plan
+        count += sub_count
+    if not pruned and all(recursive for _, recursive in plan):
+        return [(path, True)], count
+    return [(path, False)] + plan, count
+
+
+def inotify_watch_limit():
+    """Return fs.inotify.max_user_watches, if readable"""
+    try:
+        with open("/proc/sys/fs/inotify/max_user_watches", encoding="utf-8") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def mount_fs_type(path):
+    """Return the filesystem type of the mount holding `path`, if known.
+
+    Same lookup as standalone_watcher._mount_fs_type, duplicated on purpose.
+    """
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best = ("", None)
+    for mount_point, fs_type in mounts:
+        # /proc/mounts escapes spaces in mount points as \040
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best[0]):
+            best = (mount_point, fs_type)
+    return best[1]
+
 
+def create_observer():
+    """Create the observer selected by WATCH_MODE"""
+    mode = WATCH_MODE
+    if mode == "auto":
+        fs_type = mount_fs_type(WATCH_PATH)
+        mode = "polling" if fs_type in NETWORK_FS_TYPES else "inotify"
+        log.info("Detected %s filesystem for %s.", fs_type or "unknown", WATCH_PATH)
+    if mode == "polling":
+        log.info("Using polling observer (every %ss).", WATCH_INTERVAL)
+        return PollingObserver(timeout=WATCH_INTERVAL)
+    if mode != "inotify":
+        log.warning("Unknown WATCH_MODE '%s', using inotify.", WATCH_MODE)
+    return Observer()
 
-class IndexingEventHandler(FileSystemEventHandler):
-    def on_any_event(self, event):
-        if event.is_directory:
+
+class IndexingEventHandler(PatternMatchingEventHandler):
+    """Collects content changes (create/modify/move/delete) for indexing.
+
+    Only the on_<type> hooks for those events are overridden, so opens,
+    read-only closes and attribute-only events are dropped in dispatch.
+    """
+
+    def __init__(self):
+        super().__init__(ignore_patterns=IGNORE_PATTERNS, ignore_directories=True)
+        self._lock = threading.Lock()
+        self._pending = set()
+        # Bumped for every recorded change; a batch whose changes all came
+        # before the start of a finished run was already covered by it
+        self._epoch = 0
+        self._indexed_epoch = 0
+        # Set whenever a change is recorded; the debounce thread waits on it
+        self._changed = threading.Event()
+        # Decided by the worker once it has loaded the flows
+        self._in_process = False
+        self._observer = None
+        # Watched without recursion because they contain an ignored directory
+        self._flat_dirs = set()
+        # One long-lived thread debounces and a single worker runs the
+        # indexing, so runs never overlap and events never start a thread
+        self._debouncer = threading.Thread(target=self._debounce_loop, daemon=True)
+        self._debouncer.start()
+        self._worker = threading.Thread(target=self._index_worker, daemon=True)
+        self._worker.start()
+
+    def schedule(self, observer):
+        """Schedule watches for WATCH_PATH on `observer`, skipping ignored
+        directories, and return the number of directories watched"""
+        self._observer = observer
+        plan, count = plan_watches(WATCH_PATH)
+        for path, recursive in plan:
+            observer.schedule(self, path, recursive=recursive)
+            if not recursive:
+                self._flat_dirs.add(path)
+        return count
+
+    def dispatch(self, event):
+        if event.is_directory and event.event_type in ("created", "moved"):
+            self._watch_new_dir(getattr(event, "dest_path", "") or event.src_path)
+        # Glob patterns only match the trailing path components, so check for
+        # ignored directories at any depth below WATCH_PATH separately
+        paths = [p for p in (event.src_path, getattr(event, "dest_path", "")) if p]
+        if all(in_ignored_dir(p) for p in paths):
             return
-        print(f"Change detected: {event.src_path}. Triggering indexing...")
-        # Replace the following with the actual indexing command or function
+        super().dispatch(event)
+
+    def _watch_new_dir(self, path):
+        # Directories appearing below a recursive watch are picked up by it;
+        # those created directly in a non-recursive one need their own watch
+        if (
+            os.path.dirname(path) not in self._flat_dirs
+            or os.path.basename(path) in IGNORE_DIR_NAMES
+        ):
+            return
+        self._observer.schedule(self, path, recursive=True)
+        # Files may have landed in it before the watch was in place
+        self._record(path)
+
+    def on_created(self, event):
+        self._record(event.src_path)
+
+    def on_modified(self, event):
+        self._record(event.src_path)
+
+    def on_deleted(self, event):
+        self._record(event.src_path)
+
+    def on_moved(self, event):
+        # Keep only the side that isn't ignored, e.g. just the target of an
+        # editor's "write temp file, rename over original" save
+        self._record(
+            *(
+                p
+                for p in (event.src_path, event.dest_path)
+                if not in_ignored_dir(p)
+                and match_any_paths(
+                    [p],
+                    excluded_patterns=self.ignore_patterns,
+                    case_sensitive=self.case_sensitive,
+                )
+            )
+        )
+
+    def _record(self, *paths):
+        # Collect the change and restart the quiet period, so a burst of
+        # events (editor saves, git checkout, rsync) is indexed only once
+        with self._lock:
+            self._pending.update(paths)
+            self._epoch += 1
+        self._changed.set()
+
+    def _debounce_loop(self):
+        """Flush once no change has been recorded for DEBOUNCE_SEC"""
+        while True:
+            self._changed.wait()
+            # Each change arriving within the quiet period restarts it
+            while not shutdown_event.is_set():
+                self._changed.clear()
+                if not self._changed.wait(DEBOUNCE_SEC):
+                    break
+            if shutdown_event.is_set():
+                return
+            self._flush()
+
+    def _flush(self):
+        """Hand every change collected since the last flush to the worker"""
+        with self._lock:
+            changed, self._pending = self._pending, set()
+            if not changed:
+                return
+            try:
+                work_q.put_nowait((self._epoch, changed))
+            except queue.Full:
+                # The worker is far behind; fold the batch back in and offer
+                # it again after the next quiet period
+                self._pending |= changed
+                self._changed.set()
+
+    def _index_worker(self):
+        """Index queued batches one at a time until shutdown"""
+        # Load the flows here, after lowering the priority, so the indexing
+        # engine's threads and any CLI subprocesses start out deprioritized
+        lower_thread_priority(INDEX_NICE)
+        self._in_process = load_flows_in_process()
+        while not shutdown_event.is_set():
+            batch = work_q.get()
+            if batch is None:
+                break
+            epoch, changed = batch
+            # Everything queued behind this batch is covered by the same run
+            while True:
+                try:
+                    more = work_q.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    shutdown_event.set()
+                    break
+                epoch = max(epoch, more[0])
+                changed |= more[1]
+            if epoch <= self._indexed_epoch:
+                log.debug("Skipping %d change(s) already indexed.", len(changed))
+                continue
+            # One line per batch; the debounce already bounds how often
+            log.info("Indexing %d changed file(s)...", len(changed))
+            with self._lock:
+                run_epoch = self._epoch
+            try:
+                self.run_index(changed)
+                self._indexed_epoch = run_epoch
+                log.debug("Indexing completed successfully.")
+            except Exception as e:
+                log.error("Error during indexing: %s", e)
+
+    def stop(self):
+        """Drop pending changes and let both threads exit once idle"""
+        with self._lock:
+            self._pending.clear()
+        # Wakes the debounce thread, which sees shutdown_event and returns
+        self._changed.set()
         try:
-            # Example: call the CLI to index the folder
-            subprocess.run(
-                ["python", "-m", "cocoindex.cli", "index", WATCH_PATH], check=True
+            work_q.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def run_index(self, changed):
+        """Bring every flow of APP_TARGET up to date after `changed` paths changed.
+
+        CocoIndex has no path-scoped update; instead its sources fingerprint
+        file content, so only the changed files are actually reprocessed.
+        """
+        if log.isEnabledFor(logging.DEBUG):
+            for path in sorted(changed):
+                log.debug("  %s", path)
+        if self._in_process:
+            from cocoindex import flow
+
+            flow.update_all_flows(
+                flow.FlowLiveUpdaterOptions(live_mode=False, print_stats=True)
             )
-            print("Indexing completed successfully.")
-        except Exception as e:
-            print(f"Error during indexing: {e}")
+        else:
+            subprocess.run(INDEX_ARGV, check=True)
 
 
 def start_mcp_server():
-    """Start the MCP server in a separate thread"""
+    """Replace this process with the MCP server; only returns on failure"""
+    log.info("Starting MCP server on %s...", MCP_ADDRESS)
     try:
-        print(f"Starting MCP server on {MCP_ADDRESS}...")
-        # Start the MCP server
-        subprocess.run(
-            [
-                "python",
-                "-m",
-                "cocoindex.cli",
-                "server",
-                APP_TARGET,
-                "--address",
-                MCP_ADDRESS,
-            ],
-            check=True,
-        )
-    except Exception as e:
-        print(f"Error starting MCP server: {e}")
-        # If MCP server fails, we should exit the whole process
-        os._exit(1)
+        os.execv(PY, SERVER_ARGV)
+    except OSError as e:
+        log.error("Error starting MCP server: %s", e)
+
+
+def wait_for_server(timeout=SERVER_READY_TIMEOUT):
+    """Wait until the MCP server accepts connections on MCP_ADDRESS.
+
+    Returns False if it still isn't reachable after `timeout` seconds. An
+    address without a numeric port can't be probed, so that wait is skipped.
+    """
+    host, _, port = MCP_ADDRESS.rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        log.warning("Cannot probe MCP server address '%s'; not waiting.", MCP_ADDRESS)
+        return True
+    # A wildcard bind address isn't connectable; probe the loopback instead
+    if host in ("", "0.0.0.0", "::", "[::]"):
+        host = "127.0.0.1"
+    address = (host.strip("[]"), port)
+    deadline = time.monotonic() + timeout
+    while not shutdown_event.is_set():
+        try:
+            with socket.create_connection(address, timeout=0.1):
+                return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+    return False
+
+
+def wait_for_shutdown():
+    """Block the main thread until a signal handler sets shutdown_event.
+
+    The C-level handler writes each signal to a socketpair registered as the
+    wakeup fd, so the selector returns as soon as one arrives and sleeps in
+    epoll/kqueue/select otherwise.
+    """
+    rsock, wsock = socket.socketpair()
+    rsock.setblocking(False)
+    wsock.setblocking(False)
+    old_wakeup_fd = signal.set_wakeup_fd(wsock.fileno())
+    sel = selectors.DefaultSelector()
+    sel.register(rsock, selectors.EVENT_READ)
+    try:
+        while not shutdown_event.is_set():
+            sel.select()
+            try:
+                rsock.recv(64)
+            except BlockingIOError:
+                pass
+    finally:
+        signal.set_wakeup_fd(old_wakeup_fd)
+        sel.close()
+        rsock.close()
+        wsock.close()
 
 
 def start_file_watcher():
-    """Start the file watcher"""
+    """Run the file watcher until shutdown; returns False if it failed"""
+    event_handler = observer = None
     try:
-        print(f"Starting file watcher for {WATCH_PATH}...")
+        log.info("Starting file watcher for %s...", WATCH_PATH)
 
         # Create the watch directory if it doesn't exist
         if not os.path.exists(WATCH_PATH):
-            print(f"Creating watch directory: {WATCH_PATH}")
+            log.info("Creating watch directory: %s", WATCH_PATH)
             os.makedirs(WATCH_PATH, exist_ok=True)
 
         # Set up file watcher
         event_handler = IndexingEventHandler()
-        observer = Observer()
-        observer.schedule(event_handler, WATCH_PATH, recursive=True)
+        observer = create_observer()
+        watched_dirs = event_handler.schedule(observer)
         observer.start()
 
-        print(f"File watcher started. Monitoring {WATCH_PATH} for changes...")
+        log.info("File watcher started. Monitoring %s for changes...", WATCH_PATH)
+        if not isinstance(observer, PollingObserver):
+            limit = inotify_watch_limit()
+            log.info(
+                "Watching %d directories (fs.inotify.max_user_watches is %s).",
+                watched_dirs,
+                limit or "unknown",
+            )
 
-        # Keep the watcher running
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("Stopping file watcher...")
-            observer.stop()
-        observer.join()
+        # Sleep until a shutdown signal arrives
+        wait_for_shutdown()
+        log.info("Stopping file watcher...")
 
     except Exception as e:
-        print(f"Error in file watcher: {e}")
-        os._exit(1)
+        log.error("Error in file watcher: %s", e)
+        shutdown_event.set()
+        return False
+
+    finally:
+        # Always release the inotify watches and let the worker threads exit
+        if observer is not None and observer.is_alive():
+            observer.stop()
+            observer.join()
+        if event_handler is not None:
+            event_handler.stop()
+    return True
+
+
+def exit_with_parent(parent_pid):
+    """Get SIGTERM from the kernel as soon as the parent (the MCP server) exits.
+
+    Returns False if the parent is already gone.
+    """
+    if sys.platform.startswith("linux"):
+        import ctypes
+
+        PR_SET_PDEATHSIG = 1
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM) != 0:
+            log.warning(
+                "Cannot follow MCP server exit: %s",
+                os.strerror(ctypes.get_errno()),
+            )
+    # The parent may have exited before the request took effect
+    return os.getppid() == parent_pid
 
 
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
-    print(f"Received signal {signum}. Shutting down...")
-    sys.exit(0)
+    log.info("Received signal %s. Shutting down...", signum)
+    shutdown_event.set()
 
 
 def main():
     """Main function that starts both services"""
-    print("Starting Cocoa Index with both file watcher and MCP server...")
-
-    # Register signal handlers for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stderr,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    log.info("Starting Cocoa Index with both file watcher and MCP server...")
 
-    # Start MCP server in a background thread
-    mcp_thread = threading.Thread(target=start_mcp_server, daemon=True)
-    mcp_thread.start()
+    # exec replaces the whole process, threads included, so the file watcher
+    # runs in a forked child and this process becomes the MCP server. That
+    # leaves no idle parent around, and signals from the container runtime
+    # reach the server directly.
+    server_pid = os.getpid()
+    watcher_pid = os.fork()
+    if watcher_pid == 0:
+        # Register signal handlers for graceful shutdown
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+        # Stop watching if the MCP server dies, without a thread waiting on it
+        if not exit_with_parent(server_pid):
+            shutdown_event.set()
 
-    # Give the MCP server a moment to start
-    time.sleep(2)
-    print("MCP server started in background thread.")
+        # Start watching once the MCP server is up
+        if not wait_for_server() and not shutdown_event.is_set():
+            log.warning("MCP server not reachable on %s; watching anyway.", MCP_ADDRESS)
+        if start_file_watcher():
+            sys.exit(0)
+        # Take the MCP server down with the watcher, so the container exits
+        # and its restart policy applies, as when both shared one process
+        if os.getppid() == server_pid:
+            os.kill(server_pid, signal.SIGTERM)
+        sys.exit(1)
 
-    # Start file watcher in the main thread
-    start_file_watcher()
+    start_mcp_server()
+    # Only reached if exec failed; don't leave the watcher running alone
+    os.kill(watcher_pid, signal.SIGTERM)
+    os.waitpid(watcher_pid, 0)
+    sys.exit(1)
 
 
 if __name__ == "__main__":